@@ -1,19 +1,31 @@
-import asyncio, logging, time, json, httpx
+import asyncio, logging, time, json
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from schemas import RequestPayload, ResponseTemplate
-from services.address_service import parse_address
-from services.normalize_service import normalize_customer
+from services.address_service import parse_address_batch
+from services.normalize_service import normalize_batch
 from services.dedupe_service import dedupe_candidates
-from services.golden_service import pick_golden
-from services.harmonize_service import harmonize
+from services.golden_harmonize import build_golden
+from services.harmonize_service import empty_harmonization
 from services.enrich_service import enrich
+from services.http_client import get_client, close_client
+from files.services.zipcode_service import close_cache as close_zip_cache
 from config import settings
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO),
                     format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger("mdm.app")
 
+@app.on_event("startup")
+async def _startup():
+    get_client()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await close_client()
+    await close_zip_cache()
+
 @app.get("/health")
 async def health():
     return {"ok": True}
@@ -22,9 +34,8 @@ async def health():
 async def llm_ping():
     ep = settings.OLLAMA_ENDPOINTS[0]
     try:
-        async with httpx.AsyncClient(timeout=5) as c:
-            r = await c.get(f"{ep}/api/tags")
-            return {"endpoint": ep, "status": r.status_code}
+        r = await get_client().get(f"{ep}/api/tags", timeout=5)
+        return {"endpoint": ep, "status": r.status_code}
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Ollama not reachable at {ep}: {e}")
 
@@ -35,38 +46,36 @@ async def process(payload: RequestPayload):
 
     issues = []
 
-    sem_n = asyncio.Semaphore(settings.CONCURRENCY_NORMALIZE)
-    async def _n(r):
-        try:
-            async with sem_n:
-                return await normalize_customer(r.model_dump())
-        except Exception as e:
-            issues.append({"stage":"normalize","id": getattr(r,'id',None),"error":str(e)})
-            return {}
-
-    norm = await asyncio.gather(*[_n(r) for r in payload.records])
-    logger.info(f"[STEP] normalize done in {time.time()-t0:.2f}s")
-
-    sem_a = asyncio.Semaphore(settings.CONCURRENCY_ADDRESS)
-    async def _a(r):
-        try:
-            if r.get("address") or r.get("cep"):
-                async with sem_a:
-                    r["_parsed"] = await parse_address(r)
-            return r
-        except Exception as e:
-            issues.append({"stage":"address","id": r.get('id'),"error":str(e)})
-            return r
-
-    norm = await asyncio.gather(*[_a(r) for r in norm])
-    logger.info(f"[STEP] address-parse done in {time.time()-t0:.2f}s")
+    # One dump of the whole payload instead of one model_dump() per record
+    records = payload.model_dump()["records"]
+    # Address parsing reads only input fields, so both LLM stages run at the same time
+    parse_idx = [i for i, r in enumerate(records) if r.get("address") or r.get("cep")]
+    res_n, res_a = await asyncio.gather(
+        normalize_batch(records),
+        parse_address_batch([dict(records[i]) for i in parse_idx]),
+    )
+    norm = []
+    for r, out in zip(records, res_n):
+        if isinstance(out, Exception):
+            issues.append({"stage":"normalize","id": r.get('id'),"error":str(out)})
+            out = {}
+        norm.append(out)
+    for i, out in zip(parse_idx, res_a):
+        if isinstance(out, Exception):
+            issues.append({"stage":"address","id": records[i].get('id'),"error":str(out)})
+        else:
+            norm[i]["_parsed"] = out
+    logger.info(f"[STEP] normalize + address-parse done in {time.time()-t0:.2f}s")
 
-    matches = dedupe_candidates(norm)
-    golden = pick_golden(norm) if any(op in payload.operations for op in ("consolidate","dedupe")) else None
-    harm = harmonize(golden or {})
+    consolidate = any(op in payload.operations for op in ("consolidate","dedupe"))
+    matches = dedupe_candidates(norm) if consolidate else []
+    golden, harm = (build_golden(norm, harmonize="harmonize" in payload.operations) if consolidate
+                    else (None, empty_harmonization()))
     enr = enrich(norm) if "enrich" in payload.operations else []
 
-    return ResponseTemplate(
+    # Fields are assembled here, so skip re-validation: construct without checks and return the
+    # response directly (response_model still documents the schema but is not re-applied)
+    result = ResponseTemplate.model_construct(
         record_clean=norm,
         golden_record=golden,
         matches=matches,
@@ -78,3 +87,4 @@ async def process(payload: RequestPayload):
         audit_log=[],
         confidence=0.9 if golden else 0.7
     )
+    return ORJSONResponse(result.model_dump())
@@ -9,7 +9,7 @@ class Settings(BaseModel):
     MODEL_ADDRESS: str = os.getenv("MODEL_ADDRESS", "qwen2.5:7b")
     MODEL_NORMALIZE: str = os.getenv("MODEL_NORMALIZE", "qwen2.5:7b")
     NUM_GPU: int = int(os.getenv("NUM_GPU", "22"))
-    NUM_BATCH: int = int(os.getenv("NUM_BATCH", "512"))
+    NUM_BATCH: int = int(os.getenv("NUM_BATCH", "1024"))
     NUM_CTX: int = int(os.getenv("NUM_CTX", "4096"))
     NUM_THREAD: int = int(os.getenv("NUM_THREAD", "16"))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.0"))
@@ -17,8 +17,15 @@ class Settings(BaseModel):
     TOP_K: int = int(os.getenv("TOP_K", "40"))
     REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "180"))
     LOG_LEVEL: str = os.getenv("LOG_LEVEL","INFO")
-    CONCURRENCY_NORMALIZE: int = int(os.getenv("CONCURRENCY_NORMALIZE","8"))
-    CONCURRENCY_ADDRESS: int = int(os.getenv("CONCURRENCY_ADDRESS","8"))
+    # Parallel request slots per Ollama endpoint: keep equal to OLLAMA_NUM_PARALLEL on the server side,
+    # so Ollama batches the concurrent /api/generate calls of a request into shared forward passes
+    NUM_PARALLEL: int = int(os.getenv("NUM_PARALLEL", "4"))
+    # In-flight LLM calls per stage; defaults to filling every slot of every endpoint
+    CONCURRENCY_NORMALIZE: int = int(os.getenv("CONCURRENCY_NORMALIZE", str(NUM_PARALLEL*len(OLLAMA_ENDPOINTS))))
+    CONCURRENCY_ADDRESS: int = int(os.getenv("CONCURRENCY_ADDRESS", str(NUM_PARALLEL*len(OLLAMA_ENDPOINTS))))
+    # Exact-match cache of LLM outputs (used only while TEMPERATURE=0); SIZE=0 disables, TTL=0 keeps until evicted
+    LLM_CACHE_SIZE: int = int(os.getenv("MDM_LLM_CACHE_SIZE","10000"))
+    LLM_CACHE_TTL: float = float(os.getenv("MDM_LLM_CACHE_TTL","3600"))
     # Optional: best-effort postal lookup (disabled by default)
     USE_POSTAL_LOOKUP: bool = os.getenv("USE_POSTAL_LOOKUP","0") in ("1","true","True")
     ZIPCODEBASE_KEY: str = os.getenv("ZIPCODEBASE_KEY","")
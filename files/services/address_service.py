@@ -1,19 +1,51 @@
-import httpx, json, itertools, logging, time, asyncio, re
+import orjson, logging, time, asyncio, re
 from pathlib import Path
+from typing import Dict
 from files.config import settings
-from .common import safe_json_from_text
+from .common import safe_json_from_text, gather_bounded
+from .http_client import get_client
+from .routing import pick_endpoint, observe, release
+from . import llm_cache
 
 logger = logging.getLogger("mdm.services")
-_rr = itertools.count()
+# "In-flight" to coalesce concurrent calls for the same record (same scheme as zipcode_service)
+_INFLIGHT: Dict[str, asyncio.Future] = {}
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_CEP8 = re.compile(r"\d{8}")
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 PROMPT_PATH = BASE_DIR / "prompts" / "address_prompt.txt"
-
-def _ep():
-    return settings.OLLAMA_ENDPOINTS[next(_rr)%len(settings.OLLAMA_ENDPOINTS)]
+# Template read once at import; split around the placeholder so each call is a plain concatenation
+_PROMPT_TEMPLATE = PROMPT_PATH.read_text(encoding="utf-8")
+_PROMPT_PREFIX, _, _PROMPT_SUFFIX = _PROMPT_TEMPLATE.partition("{input_json}")
+_PROMPT_VERSION = llm_cache.prompt_version(_PROMPT_TEMPLATE)
 
 async def parse_address(record: dict) -> dict:
-    prompt = PROMPT_PATH.read_text(encoding="utf-8").replace("{input_json}", json.dumps(record, ensure_ascii=False))
+    key = llm_cache.cache_key(settings.MODEL_ADDRESS, _PROMPT_VERSION, record)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # whoever arrives later awaits the first call's result; None means the first call died, so retry ourselves
+    # (shielded: a waiter's cancellation must not cancel the future shared with the other callers)
+    while (fut := _INFLIGHT.get(key)) is not None:
+        out = await asyncio.shield(fut)
+        if out is not None:
+            return dict(out)
+    fut = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = fut
+    try:
+        out = await _generate(record, key)
+        if not fut.done():
+            fut.set_result(out)
+        return out
+    finally:
+        if not fut.done():
+            fut.set_result(None)
+        _INFLIGHT.pop(key, None)
+
+async def _generate(record: dict, key: str) -> dict:
+    prompt = _PROMPT_PREFIX + orjson.dumps(record).decode() + _PROMPT_SUFFIX
     payload = {
         "model": settings.MODEL_ADDRESS,
         "prompt": prompt,
@@ -27,30 +59,49 @@ async def parse_address(record: dict) -> dict:
         },
         "stream": False
     }
-    ep = _ep()
-    timeout = httpx.Timeout(connect=5.0, read=float(settings.REQUEST_TIMEOUT), write=30.0, pool=5.0)
-    async with httpx.AsyncClient(timeout=timeout) as c:
-        last_exc = None
-        for attempt in range(1,4):
+    body = orjson.dumps(payload)
+    c = get_client()
+    last_exc = None
+    ep = None
+    for attempt in range(1,4):
+        # Retries go to a different endpoint than the one that just failed
+        ep = pick_endpoint(avoid=ep)
+        try:
+            t0=time.time()
             try:
-                t0=time.time()
-                r = await c.post(f"{ep}/api/generate", json=payload)
-                dt=time.time()-t0
-                logger.info(f"[LLM] address status={r.status_code} time={dt:.2f}s ep={ep} attempt={attempt}")
-                r.raise_for_status()
+                r = await c.post(f"{ep}/api/generate", content=body, headers=_JSON_HEADERS)
+            except asyncio.CancelledError:
+                # Our caller went away: says nothing about the node, so only free its slot
+                release(ep)
+                raise
+            except Exception:
+                observe(ep, time.time()-t0, ok=False)
+                raise
+            dt=time.time()-t0
+            observe(ep, dt, ok=r.status_code < 500)
+            logger.info(f"[LLM] address status={r.status_code} time={dt:.2f}s ep={ep} attempt={attempt}")
+            r.raise_for_status()
+            # Non-stream replies are a single JSON object; the lenient scan is only a fallback
+            try:
+                data = orjson.loads(r.content)
+            except orjson.JSONDecodeError:
                 data = safe_json_from_text(r.text)
-                resp = (data.get("response","{}") if isinstance(data, dict) else "{}").strip()
-                out = json.loads(resp)
-                if isinstance(out, dict):
-                    # canonicalize BR CEP if model returned '00000000'
-                    if out.get("postal_code") and re.fullmatch(r"\d{8}", out["postal_code"]):
-                        out["postal_code"] = out["postal_code"][:5] + "-" + out["postal_code"][5:]
-                    return out
-                return {
-                    "thoroughfare": None,"house_number": None,"neighborhood": None,"city": None,"state": None,"postal_code": None,"country_code": None,"complement": None
-                }
-            except Exception as e:
-                last_exc = e
-                logger.warning(f"[LLM] address attempt {attempt}/3 failed: {e}")
-        logger.error(f"[LLM] address failed after retries: {last_exc}")
-        return {"thoroughfare": None,"house_number": None,"neighborhood": None,"city": None,"state": None,"postal_code": None,"country_code": None,"complement": None}
+            out = orjson.loads(data["response"])
+            if isinstance(out, dict):
+                # canonicalize BR CEP if model returned '00000000'
+                if out.get("postal_code") and _CEP8.fullmatch(out["postal_code"]):
+                    out["postal_code"] = out["postal_code"][:5] + "-" + out["postal_code"][5:]
+                llm_cache.put(key, out)
+                return out
+            return {
+                "thoroughfare": None,"house_number": None,"neighborhood": None,"city": None,"state": None,"postal_code": None,"country_code": None,"complement": None
+            }
+        except Exception as e:
+            last_exc = e
+            logger.warning(f"[LLM] address attempt {attempt}/3 failed: {e}")
+    logger.error(f"[LLM] address failed after retries: {last_exc}")
+    return {"thoroughfare": None,"house_number": None,"neighborhood": None,"city": None,"state": None,"postal_code": None,"country_code": None,"complement": None}
+
+async def parse_address_batch(records: list) -> list:
+    """parse_address over a batch, keeping settings.CONCURRENCY_ADDRESS calls in flight so Ollama can batch them (see NUM_PARALLEL)."""
+    return await gather_bounded(parse_address, records, settings.CONCURRENCY_ADDRESS)
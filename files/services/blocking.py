@@ -0,0 +1,32 @@
+from datasketch import MinHash, MinHashLSH
+
+def _shingles(text: str, k: int = 3) -> set:
+    t = " ".join(text.lower().split())
+    if len(t) <= k:
+        return {t} if t else set()
+    return {t[i:i+k] for i in range(len(t)-k+1)}
+
+def candidate_pairs(texts, threshold: float = 0.5, num_perm: int = 64):
+    """(i, j) pairs, i < j, whose character shingles are likely similar (MinHash LSH); empty texts never pair.
+
+    token_set_ratio scores subsets as 100 ("ana silva" vs "ana paula silva") while their shingle Jaccard
+    is much lower, so the LSH threshold sits below the dedupe threshold to keep recall high.
+    """
+    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+    hashes = []
+    for idx, text in enumerate(texts):
+        sh = _shingles(text)
+        if not sh:
+            hashes.append(None)
+            continue
+        m = MinHash(num_perm=num_perm)
+        m.update_batch([s.encode("utf-8") for s in sh])
+        lsh.insert(idx, m)
+        hashes.append(m)
+    pairs = set()
+    for i, m in enumerate(hashes):
+        if m is None: continue
+        for j in lsh.query(m):
+            if j > i:
+                pairs.add((i, j))
+    return sorted(pairs)
@@ -1,25 +1,56 @@
-import json, logging
+import orjson, logging, asyncio
 
 logger = logging.getLogger("mdm.services")
+# Line boundaries recognised by str.splitlines() (\r\n just yields an extra empty line here)
+_LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
 
 def safe_json_from_text(text: str):
     try:
-        return json.loads(text)
+        return orjson.loads(text)
     except Exception:
         pass
     first = text.find("{"); last = text.rfind("}")
     if first != -1 and last != -1 and last > first:
         chunk = text[first:last+1]
         try:
-            return json.loads(chunk)
+            return orjson.loads(chunk)
         except Exception:
             pass
-    last_ok = None
-    for line in text.splitlines():
-        line=line.strip()
-        if not line or not line.startswith("{"): continue
+    # Last line that parses as a JSON object wins: walk lines backwards, without splitting the whole text.
+    # Lines break on the same characters as str.splitlines(); the last position of each is kept and only
+    # re-searched once consumed, so every separator is scanned over the text at most once
+    seps = {c: text.rfind(c) for c in _LINE_BREAKS}
+    end = len(text)
+    while end > 0:
+        cut = max(seps.values())
+        line = text[cut+1:end].strip()
+        end = cut
+        for c, pos in seps.items():
+            if pos >= end:
+                seps[c] = text.rfind(c, 0, end)
+        if not line.startswith("{"): continue
         try:
-            last_ok = json.loads(line)
+            return orjson.loads(line) or {}
         except Exception:
             continue
-    return last_ok or {}
+    return {}
+
+async def gather_bounded(fn, items, limit: int):
+    """Runs fn over items with a pool of at most `limit` workers; failures are returned in place as exceptions."""
+    results = [None] * len(items)
+    # Only the workers exist as coroutines, however large the batch is
+    q = asyncio.Queue()
+    for pair in enumerate(items):
+        q.put_nowait(pair)
+    async def _worker():
+        while True:
+            try:
+                idx, item = q.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results[idx] = await fn(item)
+            except Exception as e:
+                results[idx] = e
+    await asyncio.gather(*[_worker() for _ in range(min(max(1, limit), len(items)))])
+    return results
@@ -0,0 +1,27 @@
+from .harmonize_service import harmonize_field, empty_harmonization
+
+def _empty(v):
+    # Same notion of "empty" as before (None, "", [], {}), without building sentinel lists/dicts per compare
+    return v is None or (isinstance(v, (str, list, dict)) and not v)
+
+def _score(r):
+    return (5 if r.get("source") in ("ERP","CRM") else 0) + sum(1 for v in r.values() if not _empty(v))
+
+def build_golden(rows, harmonize: bool = False):
+    """Golden record (best-scored row, gaps filled from the others) plus, when `harmonize` is set, its harmonization, in one pass over the fields."""
+    if not rows: return {}, empty_harmonization()
+    best = max(rows, key=_score)
+    gold = dict(best)
+    codes, units = [], []
+    # Per field: fill gaps in the best record with the first non-empty value across rows, then harmonize it if asked
+    for k in dict.fromkeys(k for r in rows for k in r):
+        if _empty(gold.get(k)):
+            for r in rows:
+                v = r.get(k)
+                if not _empty(v):
+                    gold[k] = v
+                    break
+        if harmonize and k in gold:
+            c, u = harmonize_field(k, gold[k])
+            codes.extend(c); units.extend(u)
+    return gold, {'codes': codes, 'units': units}
@@ -1 +1,7 @@
-def harmonize(row): return {'codes':[],'units':[]}
\ No newline at end of file
+def empty_harmonization():
+    """Harmonization block with no entries (nothing requested, or nothing to harmonize)."""
+    return {'codes': [], 'units': []}
+
+def harmonize_field(key, value):
+    """Code/unit harmonization entries for one field of a record; no rules are configured yet."""
+    return [], []
@@ -0,0 +1,27 @@
+import httpx, logging
+from typing import Optional
+from files.config import settings
+
+logger = logging.getLogger("mdm.services")
+
+# Shared client: keeps connections to the Ollama endpoints alive across records
+_CLIENT: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared pooled client, creating it on first use (app startup or lazily)."""
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=64, max_connections=128, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(connect=5.0, read=float(settings.REQUEST_TIMEOUT), write=30.0, pool=5.0),
+        )
+        logger.info("[HTTP] shared client started")
+    return _CLIENT
+
+async def close_client() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+        logger.info("[HTTP] shared client closed")
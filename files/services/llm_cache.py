@@ -0,0 +1,30 @@
+import hashlib, orjson
+from typing import Optional
+from cachetools import LRUCache, TTLCache
+from files.config import settings
+
+# Exact-match cache of parsed LLM outputs. Only safe while generation is deterministic (temperature 0).
+_ENABLED = settings.LLM_CACHE_SIZE > 0 and settings.TEMPERATURE == 0.0
+_CACHE = (TTLCache(maxsize=max(1, settings.LLM_CACHE_SIZE), ttl=settings.LLM_CACHE_TTL)
+          if settings.LLM_CACHE_TTL > 0 else LRUCache(maxsize=max(1, settings.LLM_CACHE_SIZE)))
+
+def prompt_version(template: str) -> str:
+    return hashlib.blake2b(template.encode("utf-8"), digest_size=8).hexdigest()
+
+def fingerprint(record: dict) -> str:
+    raw = orjson.dumps(record, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def cache_key(model: str, version: str, record: dict) -> str:
+    return f"{model}:{version}:{fingerprint(record)}"
+
+def get(key: str) -> Optional[dict]:
+    if not _ENABLED:
+        return None
+    hit = _CACHE.get(key)
+    # Callers mutate their results (e.g. r["_parsed"] = ...), so never hand out the cached dict itself
+    return dict(hit) if hit is not None else None
+
+def put(key: str, value: dict) -> None:
+    if _ENABLED:
+        _CACHE[key] = dict(value)
@@ -0,0 +1,50 @@
+import random, time
+from typing import Dict, Optional
+from files.config import settings
+
+# Latency-aware endpoint selection shared by the LLM services: power-of-two-choices over
+# cost = EWMA latency x (in-flight + 1), so slow or busy Ollama nodes get fewer requests
+_ALPHA = 0.3
+# An estimate halves for every this many seconds without a new sample, so an endpoint that stopped
+# being picked (e.g. after a failure) gets cheaper over time and is eventually probed again
+_DECAY_HALF_LIFE = 10.0
+_EWMA: Dict[str, float] = {}
+_SEEN: Dict[str, float] = {}
+_INFLIGHT: Dict[str, int] = {}
+
+def _latency(ep: str, now: float) -> float:
+    prev = _EWMA.get(ep)
+    if prev is None:
+        return 0.0
+    return prev * 0.5 ** ((now - _SEEN[ep]) / _DECAY_HALF_LIFE)
+
+def _cost(ep: str, now: float) -> float:
+    # Small floor so in-flight counts still spread load before any latency is known
+    return (_latency(ep, now) + 1e-3) * (_INFLIGHT.get(ep, 0) + 1)
+
+def pick_endpoint(avoid: Optional[str] = None) -> str:
+    """Chooses an endpoint and counts it as in flight; always pair with observe() or release().
+    `avoid` (e.g. the endpoint a retry just failed on) is skipped whenever another one exists."""
+    eps = [e for e in settings.OLLAMA_ENDPOINTS if e != avoid] or settings.OLLAMA_ENDPOINTS
+    if len(eps) == 1:
+        ep = eps[0]
+    else:
+        now = time.monotonic()
+        a, b = random.sample(eps, 2)
+        ep = a if _cost(a, now) <= _cost(b, now) else b
+    _INFLIGHT[ep] = _INFLIGHT.get(ep, 0) + 1
+    return ep
+
+def release(ep: str) -> None:
+    """Ends an in-flight call without a latency sample (e.g. the caller was cancelled)."""
+    _INFLIGHT[ep] = max(0, _INFLIGHT.get(ep, 0) - 1)
+
+def observe(ep: str, dt: float, ok: bool = True) -> None:
+    release(ep)
+    # A failed call counts as a full timeout: a node refusing connections fails fast, and must never
+    # look cheaper than a healthy one that is merely slow
+    sample = dt if ok else max(dt, settings.REQUEST_TIMEOUT)
+    now = time.monotonic()
+    prev = _latency(ep, now) if ep in _EWMA else None
+    _EWMA[ep] = sample if prev is None else prev + _ALPHA * (sample - prev)
+    _SEEN[ep] = now
@@ -1,24 +1,72 @@
 # services/zipcode_service.py
-import os, asyncio, time, random, httpx, logging
-from typing import Dict, Any
+import os, asyncio, time, random, re, httpx, logging, orjson, aiosqlite
+from typing import Dict, Any, Optional
+from cachetools import LRUCache
 
 logger = logging.getLogger("services.zipcode_service")
 
 ZIPCODEBASE_KEY = os.getenv("ZIPCODEBASE_KEY", "")
 ZIPCODEBASE_URL = "https://app.zipcodebase.com/api/v1/search"
 
-# Simple in-memory cache (could be LRU/Redis)
-_ZIP_CACHE: Dict[str, Dict[str, Any]] = {}
+# Bounded in-memory cache in front of a persistent SQLite cache (ZIP_CACHE_DB="" keeps memory only)
+_ZIP_CACHE: LRUCache = LRUCache(maxsize=int(os.getenv("ZIP_CACHE_SIZE", "50000")))
+ZIP_CACHE_DB = os.getenv("ZIP_CACHE_DB", "zip_cache.sqlite3")
+# Rows older than this many seconds are ignored and fetched again (0 keeps them forever)
+ZIP_CACHE_MAX_AGE = int(os.getenv("ZIP_CACHE_MAX_AGE", str(30*24*3600)))
+_DB: Optional[aiosqlite.Connection] = None
+_DB_LOCK = asyncio.Lock()
 # "In-flight" to coalesce concurrent calls from the same zip code
 _INFLIGHT: Dict[str, asyncio.Future] = {}
 # Limit global competition for external calls
 _SEM = asyncio.Semaphore(int(os.getenv("ZIPCODEBASE_MAX_CONCURRENCY", "4")))
 
+_NONDIGIT = re.compile(r"\D+")
+
 def _norm_cep(cep: str) -> str:
     if not cep:
         return ""
-    d = "".join(c for c in cep if c.isdigit())
-    return d
+    return _NONDIGIT.sub("", cep)
+
+async def _db() -> Optional[aiosqlite.Connection]:
+    global _DB
+    if _DB is None and ZIP_CACHE_DB:
+        async with _DB_LOCK:
+            if _DB is None:
+                db = await aiosqlite.connect(ZIP_CACHE_DB)
+                await db.execute("CREATE TABLE IF NOT EXISTS zip_cache (cep TEXT PRIMARY KEY, payload BLOB, ts INTEGER)")
+                await db.commit()
+                _DB = db
+    return _DB
+
+async def _db_get(cep_digits: str) -> Dict[str, Any]:
+    try:
+        db = await _db()
+        if db is None:
+            return {}
+        min_ts = int(time.time()) - ZIP_CACHE_MAX_AGE if ZIP_CACHE_MAX_AGE > 0 else 0
+        async with db.execute("SELECT payload FROM zip_cache WHERE cep = ? AND ts >= ?", (cep_digits, min_ts)) as cur:
+            row = await cur.fetchone()
+        return orjson.loads(row[0]) if row else {}
+    except Exception as e:
+        logger.warning(f"[Zip] sqlite read failed for {cep_digits}: {e}")
+        return {}
+
+async def _db_put(cep_digits: str, parsed: Dict[str, Any]) -> None:
+    try:
+        db = await _db()
+        if db is None:
+            return
+        await db.execute("INSERT OR REPLACE INTO zip_cache (cep, payload, ts) VALUES (?, ?, ?)",
+                         (cep_digits, orjson.dumps(parsed), int(time.time())))
+        await db.commit()
+    except Exception as e:
+        logger.warning(f"[Zip] sqlite write failed for {cep_digits}: {e}")
+
+async def close_cache() -> None:
+    global _DB
+    if _DB is not None:
+        await _DB.close()
+        _DB = None
 
 async def _via_cep(cep_digits: str) -> Dict[str, Any]:
     """Free BR fallback (no aggressive limits)."""
@@ -111,7 +159,7 @@ async def _zipcodebase_lookup(cep_digits: str, country: str) -> Dict[str, Any]:
     return {}
 
 async def enrich_address_with_zipcode(record: Dict[str, Any]) -> Dict[str, Any]:
-    """Enriches record['_parsed'] via Zipcodebase with ViaCEP caching, coalescing, and fallback."""
+    """Enriches record['_parsed'] via Zipcodebase with ViaCEP fallback, LRU + SQLite caching, and coalescing."""
     cep_digits = _norm_cep(record.get("cep", ""))
     country = (record.get("country_code") or "BR").upper()
 
@@ -119,54 +167,67 @@ async def enrich_address_with_zipcode(record: Dict[str, Any]) -> Dict[str, Any]:
         return record
 
     # 1) cache hit
-    if cep_digits in _ZIP_CACHE:
-        record["_parsed"] = _ZIP_CACHE[cep_digits]
+    cached = _ZIP_CACHE.get(cep_digits)
+    if cached:
+        record["_parsed"] = cached
         return record
 
     # 2) coalesce concurrent calls from the same zip code
-    #    (whoever arrives later awaits the future response to the first call)
+    #    (whoever arrives later awaits the future response to the first call).
+    #    Check-and-register has no await in between, so on the event loop it is atomic:
+    #    exactly one caller per CEP becomes the leader, without a lock.
     fut = _INFLIGHT.get(cep_digits)
-    if fut:
-        try:
-            parsed = await fut
-            if parsed:
-                _ZIP_CACHE[cep_digits] = parsed
-                record["_parsed"] = parsed
-            return record
-        except Exception:
-            # If future failed, let's try ourselves
-            pass
-
-    # 3) first thread: creates the future and executes the query under semaphore
-    loop = asyncio.get_running_loop()
-    _INFLIGHT[cep_digits] = loop.create_future()
+    is_leader = fut is None
+    if is_leader:
+        fut = asyncio.get_running_loop().create_future()
+        _INFLIGHT[cep_digits] = fut
+
+    if not is_leader:
+        # The leader always resolves the future (with {} on failure) and fills the LRU itself;
+        # shielded so a cancelled waiter does not cancel the future the leader and other waiters share
+        parsed = await asyncio.shield(fut)
+        if parsed:
+            record["_parsed"] = parsed
+        return record
 
+    # 3) leader: executes the query under semaphore
     try:
-        async with _SEM:
-            parsed = {}
-            if ZIPCODEBASE_KEY:
-                parsed = await _zipcodebase_lookup(cep_digits, country)
-
-            # Fallback a ViaCEP se Zipcodebase falhar/limitar
-            if not parsed and country == "BR":
-                parsed = await _via_cep(cep_digits)
-
-            # Store in cache
-            if parsed:
-                _ZIP_CACHE[cep_digits] = parsed
-
-            # Resolves coalesced waits
-            if not _INFLIGHT[cep_digits].done():
-                _INFLIGHT[cep_digits].set_result(parsed)
-
-            if parsed:
-                record["_parsed"] = parsed
-            return record
+        # 3a) persistent cache (survives restarts)
+        parsed = await _db_get(cep_digits)
+        if not parsed:
+            async with _SEM:
+                if ZIPCODEBASE_KEY:
+                    parsed = await _zipcodebase_lookup(cep_digits, country)
+
+                # Fallback a ViaCEP se Zipcodebase falhar/limitar
+                if not parsed and country == "BR":
+                    parsed = await _via_cep(cep_digits)
+
+            fetched = bool(parsed)
+        else:
+            fetched = False
+
+        # Store in cache
+        if parsed:
+            _ZIP_CACHE[cep_digits] = parsed
+
+        # Resolves coalesced waits
+        if not fut.done():
+            fut.set_result(parsed)
+
+        # Write-through to the persistent cache (after waiters are released)
+        if fetched:
+            await _db_put(cep_digits, parsed)
+
+        if parsed:
+            record["_parsed"] = parsed
+        return record
     except Exception as e:
         logger.error(f"[Zip] enrich error for {cep_digits}: {e}")
-        if cep_digits in _INFLIGHT and not _INFLIGHT[cep_digits].done():
-            _INFLIGHT[cep_digits].set_result({})
         return record
     finally:
-        # Clean the in-flight switch (prevents leakage)
-        _INFLIGHT.pop(cep_digits, None)
+        # Never leave waiters hanging (error or cancellation), then clean the in-flight switch
+        if not fut.done():
+            fut.set_result({})
+        if _INFLIGHT.get(cep_digits) is fut:
+            del _INFLIGHT[cep_digits]